@@ -2,20 +2,29 @@ import argparse
 import asyncio
 import csv
 import json
+import os
 import random
 import re
+import sys
+import threading
 import time
+import traceback
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from playwright.async_api import async_playwright, Page, Locator, TimeoutError as PWTimeout
+from playwright.async_api import async_playwright, expect, Page, Locator, TimeoutError as PWTimeout
 
 # -----------------------
 # Utilities
 # -----------------------
 
+OTHER_PREFIX_RE = re.compile(r"^\s*other.*?:\s*", re.I)
+CHOICE_INPUT_RE = re.compile(r"#mc-choice-input-(QID\d+)-(\d+)$")
+
 def norm_space(s: Any) -> str:
-    return re.sub(r"\s+", " ", str(s or "")).strip()
+    # str.split() splits on exactly the characters re's \s matches (incl. NBSP), without the regex engine
+    return " ".join(str(s or "").split())
 
 def norm_case(s: Any) -> str:
     return norm_space(s).lower()
@@ -23,11 +32,9 @@ def norm_case(s: Any) -> str:
 def parse_multi(cell: str, delim: Optional[str]) -> List[str]:
     if not cell:
         return []
-    if delim:
-        parts = [norm_space(p) for p in str(cell).split(delim)]
-    else:
-        parts = [norm_space(p) for p in re.split(r"[;,]", str(cell))]
-    return [p for p in parts if p]
+    # no delimiter configured: both ';' and ',' separate items
+    raw = str(cell).split(delim) if delim else str(cell).replace(",", ";").split(";")
+    return [p for p in map(norm_space, raw) if p]
 
 def css_from_entry(entry: Dict[str, Any]) -> str:
     if entry.get("id"):
@@ -37,24 +44,86 @@ def css_from_entry(entry: Dict[str, Any]) -> str:
         return css[len("css="):] if css.startswith("css=") else css
     raise ValueError("Mapping entry missing 'id' or 'css'.")
 
+def prepare_mapping(mapping: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One-time pass over the loaded mapping so per-row/per-page code only does
+    dict lookups. Derived fields use a leading underscore (e.g. '_sel').
+    """
+    used: Set[str] = set()
+    for kind in ("text", "radio", "checkbox", "combobox"):
+        for entry in mapping.get(kind, []):
+            for key in ("csv", "default_from_csv"):
+                if entry.get(key):
+                    entry[key] = norm_case(entry[key])
+                    used.add(entry[key])
+    mapping["_used_cols"] = used
+    for entry in mapping.get("text", []):
+        entry["_sel"] = css_from_entry(entry)
+    for kind in ("radio", "checkbox"):
+        for entry in mapping.get(kind, []):
+            entry["_value_map_ci"] = value_map_index(entry.get("value_map"))
+    return mapping
+
+def value_map_index(value_map: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """{norm_case(label): choice value}; the first label wins when two normalize alike."""
+    index: Dict[str, str] = {}
+    for k, v in (value_map or {}).items():
+        index.setdefault(norm_case(k), v)
+    return index
+
+def normalize_row(row: Dict[str, str], keep: Optional[Set[str]] = None) -> Dict[str, str]:
+    """
+    Case/whitespace-insensitive header keys (matches prepare_mapping), built once per
+    CSV row. 'keep' drops every column the mapping never reads.
+    """
+    out = {}
+    for k, v in row.items():
+        if k is None:
+            continue
+        nk = norm_case(k)
+        if keep is None or nk in keep:
+            out[nk] = v
+    return out
+
 def jitter(base_ms: int, spread: int = 30) -> int:
     lo = max(0, base_ms - spread)
     hi = base_ms + spread
     return random.randint(lo, hi)
 
 # Simple cross-version waiter (avoids wait_for_function signature issues)
-async def wait_for_condition(page: Page, js_predicate: str, arg: Any = None, timeout_ms: int = 2000, interval_ms: int = 100) -> bool:
+async def wait_for_condition(page: Page, js_predicate: str, arg: Any = None, timeout_ms: int = 2000, interval_ms: int = 100) -> Any:
     """
-    Polls a JS predicate until it returns truthy or timeout.
+    Waits until a JS predicate returns truthy or timeout; returns that truthy value
+    (so a predicate can hand back what it saw) or False.
     js_predicate must be a function body with one argument 'arg', e.g.:
       "(arg) => { const el = document.querySelector(arg.sel); return !!el; }"
+    The predicate is re-checked in-page (one evaluate for the whole wait) on every DOM
+    mutation and every interval_ms, since layout/style-driven predicates can turn true
+    without a mutation; if that evaluate dies (e.g. navigation), falls back to polling.
     """
+    observed = f"""(a) => new Promise((resolve) => {{
+        const pred = {js_predicate};
+        const check = () => {{ try {{ return pred(a.arg) || false; }} catch (e) {{ return false; }} }};
+        const first = check();
+        if (first) return resolve(first);
+        let obs, poll, timer;
+        const finish = (v) => {{ obs.disconnect(); clearInterval(poll); clearTimeout(timer); resolve(v); }};
+        const recheck = () => {{ const v = check(); if (v) finish(v); }};
+        obs = new MutationObserver(recheck);
+        poll = setInterval(recheck, a.interval);
+        timer = setTimeout(() => finish(check()), a.timeout);
+        obs.observe(document.documentElement, {{childList: true, subtree: true, attributes: true}});
+    }})"""
     deadline = time.monotonic() + (timeout_ms / 1000.0)
+    try:
+        return (await page.evaluate(observed, {"arg": arg, "timeout": timeout_ms, "interval": interval_ms})) or False
+    except Exception:
+        pass
     while time.monotonic() < deadline:
         try:
             ok = await page.evaluate(js_predicate, arg)
             if ok:
-                return True
+                return ok
         except Exception:
             pass
         await page.wait_for_timeout(interval_ms)
@@ -64,12 +133,16 @@ async def wait_for_condition(page: Page, js_predicate: str, arg: Any = None, tim
 # Fast presence checks (no long waits)
 # -----------------------
 
+# Same test as Playwright's is_visible (non-empty box, not visibility:hidden), in one evaluate
+VISIBLE_JS = """(s) => {
+    const el = document.querySelector(s);
+    if (!el) return false;
+    return el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+}"""
+
 async def selector_visible(page: Page, selector: str) -> bool:
-    loc = page.locator(selector)
     try:
-        if await loc.count() == 0:
-            return False
-        return await loc.first.is_visible()
+        return bool(await page.evaluate(VISIBLE_JS, selector))
     except Exception:
         return False
 
@@ -85,31 +158,82 @@ async def checkbox_group_present(page: Page, group: str) -> bool:
     except Exception:
         return False
 
+async def wait_visible(page: Page, selector: str, timeout_ms: int = 1500) -> bool:
+    try:
+        await page.locator(selector).first.wait_for(state="visible", timeout=timeout_ms)
+        return True
+    except Exception:
+        return False
+
 async def combobox_present(page: Page, combo_id: str) -> bool:
     return await selector_visible(page, f"div[role='combobox']#{combo_id}")
 
+PROBE_JS = """(specs) => specs.map(([sel, visible]) => {
+    const el = document.querySelector(sel);
+    if (!el) return false;
+    return !visible || (el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden');
+})"""
+
+async def probe_page_controls(page: Page, mapping: Dict[str, Any]) -> Dict[Tuple[str, str], bool]:
+    """
+    Snapshots the presence of every mapped control in a single evaluate instead of
+    one round-trip per mapping entry. Text/combobox controls must be visible;
+    radio/checkbox groups only need to exist — the *_present helpers define these rules
+    and are what the fallback uses if the batched evaluate fails.
+    Keys are (kind, selector-or-group), e.g. ("radio", "QID10").
+    """
+    keys: List[Tuple[str, str]] = []
+    specs: List[Tuple[str, bool]] = []
+    for entry in mapping.get("text", []):
+        sel = entry.get("_sel") or css_from_entry(entry)
+        keys.append(("text", sel)); specs.append((sel, True))
+    for r in mapping.get("radio", []):
+        if r.get("group"):
+            keys.append(("radio", r["group"])); specs.append((f"input[type='radio'][name='{r['group']}']", False))
+    for c in mapping.get("checkbox", []):
+        if c.get("group"):
+            keys.append(("checkbox", c["group"])); specs.append((f"input[type='checkbox'][name='{c['group']}']", False))
+    for cb in mapping.get("combobox", []):
+        if cb.get("id"):
+            keys.append(("combobox", cb["id"])); specs.append((f"div[role='combobox']#{cb['id']}", True))
+    try:
+        results = await page.evaluate(PROBE_JS, specs)
+    except Exception:
+        # one call per control through the *_present helpers (same rules, more round-trips)
+        helpers = {"text": selector_visible, "radio": radio_group_present,
+                   "checkbox": checkbox_group_present, "combobox": combobox_present}
+        results = await asyncio.gather(*(helpers[kind](page, key) for kind, key in keys))
+    return dict(zip(keys, results))
+
 # -----------------------
 # Debug Scans
 # -----------------------
 
 async def debug_scan_page(page: Page) -> None:
+    """Prints visible questions and every choice group (radio + checkbox) from one evaluate."""
     try:
-        radio_groups = await page.evaluate("""
+        scan = await page.evaluate("""
             () => {
-              const out = [];
-              const inputs = Array.from(document.querySelectorAll("input[type='radio'][id^='mc-choice-input-']"));
+              const questions = Array.from(document.querySelectorAll("section.question[id^='question-QID']"))
+                .map(el => ({
+                   id: el.id,
+                   text: (el.querySelector(".question-display")?.innerText || "")
+                           .replace(/\\s+/g," ").trim().slice(0,140)
+                }));
+              const inputs = Array.from(document.querySelectorAll(
+                "input[type='radio'][id^='mc-choice-input-'], input[type='checkbox'][id^='mc-choice-input-']"));
               const byGroup = new Map();
               for (const el of inputs) {
                 const name = el.name;
                 if (!name) continue;
-                if (!byGroup.has(name)) byGroup.set(name, []);
+                if (!byGroup.has(name)) byGroup.set(name, {type: el.type, options: []});
                 const labelId = el.getAttribute('aria-labelledby');
                 let labelText = '';
                 if (labelId) {
                   const lab = document.getElementById(labelId);
                   labelText = lab ? lab.textContent.trim() : '';
                 }
-                byGroup.get(name).push({
+                byGroup.get(name).options.push({
                   id: el.id || '',
                   value: el.getAttribute('value') || null,
                   aria: labelId || '',
@@ -117,35 +241,36 @@ async def debug_scan_page(page: Page) -> None:
                   selected: el.checked === true
                 });
               }
-              return Array.from(byGroup.entries()).map(([group, options]) => ({group, options}));
+              const groups = Array.from(byGroup.entries()).map(([group, g]) => ({group, type: g.type, options: g.options}));
+              return {questions, groups};
             }
         """)
-        for g in radio_groups:
-            print(f"[debug] Group {g['group']} options:")
-            for o in g["options"]:
-                print(f"  id='{o['id']}' value={o['value']} aria='{o['aria']}' label='{o['label']}' selected={o['selected']}")
+        out: List[str] = []
+        if scan["questions"]:
+            out.append("[page-scan] Visible questions:")
+            out.extend(f"  - {q['id']}: {q['text']}" for q in scan["questions"])
+        for g in scan["groups"]:
+            out.append(f"[debug] Group {g['group']} ({g['type']}) options:")
+            out.extend(f"  id='{o['id']}' value={o['value']} aria='{o['aria']}' label='{o['label']}' selected={o['selected']}"
+                       for o in g["options"])
+        if out:
+            sys.stdout.write("\n".join(out) + "\n")
     except Exception as e:
         print(f"[warn] debug_scan_page error: {e}")
 
-async def list_visible_questions(page: Page) -> None:
-    print("[page-scan] page waiting to scan questions…")
-    await page.wait_for_timeout(600)  # settle DOM ~0.6s before scanning
-
+async def visible_error_messages(page: Page) -> List[str]:
+    """Texts of visible Qualtrics validation errors, gathered in one evaluate."""
     try:
-        qinfo = await page.evaluate("""
-            () => Array.from(document.querySelectorAll("section.question[id^='question-QID']"))
-              .map(el => ({
-                 id: el.id,
-                 text: (el.querySelector(".question-display")?.innerText || "")
-                         .replace(/\\s+/g," ").trim().slice(0,140)
-              }))
+        return await page.evaluate("""
+            () => Array.from(document.querySelectorAll(".error-message"))
+              .filter(e => e.offsetParent !== null)
+              .map(e => {
+                 const q = e.closest("section.question");
+                 return (q ? q.id + ": " : "") + (e.innerText || "").replace(/\\s+/g, " ").trim();
+              })
         """)
-        if qinfo:
-            print("[page-scan] Visible questions:")
-            for q in qinfo:
-                print(f"  - {q['id']}: {q['text']}")
     except Exception:
-        pass
+        return []
 
 # -----------------------
 # Typing / Clicking
@@ -157,44 +282,78 @@ async def type_like_human(page: Page, locator: Locator, text: str, per_char_ms:
         await target.scroll_into_view_if_needed()
         await page.wait_for_timeout(jitter(50, 20))
         await target.click(force=True)
-        # Clear
-        try:
-            await target.clear()
-        except Exception:
+        if per_char_ms <= 0:
+            # fill() replaces the value and fires input itself: no clear, per-key or verify round-trips
+            await target.fill(str(text))
+        else:
+            # Clear
             try:
-                await target.fill("")
+                await target.clear()
             except Exception:
-                await page.keyboard.press("Control+A")
-                await page.keyboard.press("Delete")
-        await page.wait_for_timeout(jitter(60, 30))
-        for ch in str(text):
-            await target.type(ch, delay=jitter(per_char_ms, int(per_char_ms * 0.3)))
-        # verify
-        try:
-            val = await target.input_value()
-            if norm_space(val) != norm_space(text):
-                print(f"[retry] Typed mismatch. got='{val}' expected='{text}'. Using .fill()")
-                await target.fill(str(text))
-        except Exception:
-            pass
-        # blur
+                try:
+                    await target.fill("")
+                except Exception:
+                    await page.keyboard.press("Control+A")
+                    await page.keyboard.press("Delete")
+            await page.wait_for_timeout(jitter(60, 30))
+            for ch in str(text):
+                await target.type(ch, delay=jitter(per_char_ms, int(per_char_ms * 0.3)))
+            # verify
+            try:
+                val = await target.input_value()
+                if norm_space(val) != norm_space(text):
+                    print(f"[retry] Typed mismatch. got='{val}' expected='{text}'. Using .fill()")
+                    await target.fill(str(text))
+            except Exception:
+                pass
+        # blur (Tab moves focus away, firing the field's blur/focusout handlers)
         await page.keyboard.press("Tab")
-        await page.wait_for_timeout(jitter(80, 30))
-        await page.mouse.click(10, 10)
-        await page.wait_for_timeout(jitter(70, 30))
         return True
     except Exception as e:
         if debug:
             print(f"[warn] type_like_human failed: {e}")
         return False
 
-async def click_selector(page: Page, selector: str, debug: bool = False) -> bool:
+BULK_FILL_JS = """(p) => {
+    const written = [];
+    for (const [s, v] of Object.entries(p)) {
+        const el = document.querySelector(s);
+        if (!el) continue;
+        // focus first: blur() on an unfocused element fires no blur/focusout, so
+        // Qualtrics' on-blur validation would never run
+        el.focus();
+        // native setter so controlled (React) inputs register the change
+        const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, v);
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+        el.blur();
+        written.push(s);
+    }
+    return written;
+}"""
+
+async def fill_fields_bulk(page: Page, payload: Dict[str, str], debug: bool) -> List[str]:
+    """
+    Writes several text inputs in one evaluate call ({selector: value}) instead of
+    one round-trip per field. Returns the selectors that were found and written
+    (empty if the evaluate failed), so the caller can fall back for the rest.
+    """
+    try:
+        return await page.evaluate(BULK_FILL_JS, payload)
+    except Exception as e:
+        print(f"[warn] bulk fill failed: {e}")
+        return []
+
+async def click_selector(page: Page, selector: str, debug: bool = False, pace: bool = True) -> bool:
+    """pace=False skips the human-like pauses when the caller waits on a DOM condition next."""
     try:
         loc = page.locator(selector).first
-        await loc.scroll_into_view_if_needed()
-        await page.wait_for_timeout(jitter(40, 15))
-        await loc.click(force=True)
-        await page.wait_for_timeout(jitter(60, 25))
+        if pace:
+            await page.wait_for_timeout(jitter(40, 15))
+        await loc.click(force=True)  # click() scrolls into view itself
+        if pace:
+            await page.wait_for_timeout(jitter(60, 25))
         if debug:
             print(f"[DEBUG] Clicked: {selector}")
         return True
@@ -203,35 +362,70 @@ async def click_selector(page: Page, selector: str, debug: bool = False) -> bool
             print(f"[warn] click failed {selector}: {e}")
         return False
 
+CHECK_RADIO_JS = """(s) => {
+    const r = document.querySelector(s);
+    if (!r) return false;
+    if (!r.checked) r.click();
+    return r.checked;
+}"""
+
+CHECK_BOXES_JS = """(sels) => sels.map((s) => {
+    const el = document.querySelector(s);
+    if (!el) return false;
+    if (!el.checked) el.click();
+    return el.checked;
+})"""
+
+async def check_radio(page: Page, selector: str, debug: bool = False) -> bool:
+    """
+    Selects a radio in one evaluate (click only if not already checked, report the
+    resulting state). Only if the in-page click didn't stick: .check(), then click_selector.
+    """
+    try:
+        if await page.evaluate(CHECK_RADIO_JS, selector):
+            if debug:
+                print(f"[DEBUG] Checked: {selector}")
+            return True
+    except Exception as e:
+        if debug:
+            print(f"[warn] check via JS failed {selector}: {e}")
+    try:
+        await page.locator(selector).first.check(force=True, timeout=3000)
+        return True
+    except Exception:
+        return await click_selector(page, selector, debug=debug)
+
 # -----------------------
 # Resolvers
 # -----------------------
 
-def resolve_radio_selector(group: str, value_map: Dict[str, str], desired: str) -> Optional[str]:
+def resolve_radio_selector(group: str, value_map: Dict[str, str], desired: str,
+                           value_map_ci: Optional[Dict[str, str]] = None) -> Optional[str]:
     if not desired:
         return None
     if desired in value_map:
         return f"#mc-choice-input-{group}-{value_map[desired]}"
-    want = norm_case(desired)
-    for k, v in value_map.items():
-        if norm_case(k) == want:
-            return f"#mc-choice-input-{group}-{v}"
+    if value_map_ci is None:
+        value_map_ci = value_map_index(value_map)
+    hit = value_map_ci.get(norm_case(desired))
+    if hit:
+        return f"#mc-choice-input-{group}-{hit}"
     return None
 
-def resolve_checkboxes(group: str, value_map: Optional[Dict[str, str]], cell: str, multi_delim: Optional[str]) -> Tuple[List[str], List[str]]:
+def resolve_checkboxes(group: str, value_map: Optional[Dict[str, str]], cell: str, multi_delim: Optional[str],
+                       value_map_ci: Optional[Dict[str, str]] = None) -> Tuple[List[str], List[str]]:
     items = parse_multi(cell, multi_delim)
     if not items:
         return [], []
     to_select, unmatched = [], []
     if value_map:
+        if value_map_ci is None:
+            value_map_ci = value_map_index(value_map)
         for it in items:
             if it in value_map:
                 to_select.append(f"#mc-choice-input-{group}-{value_map[it]}")
                 continue
-            hit = None
-            for k, v in value_map.items():
-                if norm_case(k) == norm_case(it):
-                    hit = v; break
+            hit = value_map_ci.get(it.lower())  # parse_multi already collapsed whitespace
             if hit:
                 to_select.append(f"#mc-choice-input-{group}-{hit}")
             else:
@@ -251,9 +445,9 @@ async def open_combobox(page: Page, combo_id: str, debug: bool) -> bool:
     """
     combo_sel = f"div[role='combobox']#{combo_id}"
     menu_sel  = f"ul#select-menu-{combo_id}"
+    combo = page.locator(combo_sel).first
     for attempt in range(3):
         try:
-            combo = page.locator(combo_sel).first
             await combo.scroll_into_view_if_needed()
             try:
                 await combo.click(force=True)
@@ -300,6 +494,8 @@ async def choose_combobox_by_text(page: Page, combo_id: str, visible_text: str,
     want = norm_space(visible_text).lower()
     combo_sel = f"div[role='combobox']#{combo_id}"
     menu_sel  = f"ul#select-menu-{combo_id}"
+    combo = page.locator(combo_sel)
+    candidates = page.locator(f"{menu_sel} li.menu-item")
 
     for attempt in range(3):
         try:
@@ -322,7 +518,7 @@ async def choose_combobox_by_text(page: Page, combo_id: str, visible_text: str,
             )
             if not items:
                 if debug: print(f"[warn] No items in combobox #{combo_id}")
-                try: await page.locator(combo_sel).press("Escape")
+                try: await combo.press("Escape")
                 except Exception: pass
                 continue
 
@@ -338,22 +534,21 @@ async def choose_combobox_by_text(page: Page, combo_id: str, visible_text: str,
             idx = find_index()
             if idx < 0:
                 if debug: print(f"[warn] COMBO '{combo_id}' option not found for {visible_text!r}")
-                try: await page.locator(combo_sel).press("Escape")
+                try: await combo.press("Escape")
                 except Exception: pass
                 return False
 
-            candidates = page.locator(f"{menu_sel} li.menu-item")
-            try:
-                await candidates.nth(idx).scroll_into_view_if_needed()
-            except Exception:
-                pass
-
             try:
-                await candidates.nth(idx).click(force=True)
+                await candidates.nth(idx).click(force=True)  # click() scrolls the item into view itself
             except PWTimeout:
-                # Re-open and try again by id
-                await page.locator(combo_sel).press("Escape")
-                await page.wait_for_timeout(120)
+                # Re-open and try again by id (wait for the menu to report closed, not a fixed sleep)
+                await combo.press("Escape")
+                await wait_for_condition(
+                    page,
+                    "(sel) => { const c = document.querySelector(sel); return !c || c.getAttribute('aria-expanded') !== 'true'; }",
+                    combo_sel,
+                    timeout_ms=1000
+                )
                 if not await open_combobox(page, combo_id, debug):
                     return False
                 items2 = await page.evaluate(
@@ -363,7 +558,7 @@ async def choose_combobox_by_text(page: Page, combo_id: str, visible_text: str,
                 if items2 and idx < len(items2) and items2[idx]:
                     await page.locator(f"#{items2[idx]}").click(force=True)
                 else:
-                    await page.locator(f"{menu_sel} li.menu-item").nth(idx).click(force=True)
+                    await candidates.nth(idx).click(force=True)
 
             # Verify the combobox button now shows the chosen text (poll)
             ok = await wait_for_condition(
@@ -380,7 +575,7 @@ async def choose_combobox_by_text(page: Page, combo_id: str, visible_text: str,
                 interval_ms=80
             )
             if not ok:
-                try: await page.locator(combo_sel).press("Escape")
+                try: await combo.press("Escape")
                 except Exception: pass
 
             if debug: print(f"[DEBUG] Combobox {combo_id} → '{visible_text}'")
@@ -396,8 +591,21 @@ async def choose_combobox_by_text(page: Page, combo_id: str, visible_text: str,
 # Fill visible page only (returns number of actions performed)
 # -----------------------
 
+class RowHalted(Exception):
+    """A row can't be filled (e.g. halt_if_empty); stops that row only, the batch goes on."""
+
 OTHER_RE = re.compile(r"choice-display-(QID\d+)-(\d+)")
 
+# Picks the Other textbox selector (label-scoped candidate if it exists, else the mapped css)
+# and reports [selector, match count, first-match visible] in one evaluate
+OTHER_TEXT_TARGET_JS = """([candidate, fallback]) => {
+    const sel = (candidate && document.querySelector(candidate)) ? candidate : fallback;
+    const els = document.querySelectorAll(sel);
+    const el = els[0];
+    const visible = !!el && el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+    return [sel, els.length, visible];
+}"""
+
 def derive_other_radio_selector(group: str, other_text_css: str) -> Optional[str]:
     m = OTHER_RE.search(other_text_css)
     if not m:
@@ -407,13 +615,16 @@ def derive_other_radio_selector(group: str, other_text_css: str) -> Optional[str
         return None
     return f"#mc-choice-input-{group}-{idx}"
 
-async def fill_current_page(page: Page, mapping: Dict[str, Any], row: Dict[str, str], human_delay: int, debug: bool) -> int:
+async def fill_current_page(page: Page, mapping: Dict[str, Any], row: Dict[str, str], human_delay: int, debug: bool,
+                            tag: str = "") -> int:
     actions = 0
+    present = await probe_page_controls(page, mapping)
 
-    # TEXT
+    # TEXT (with --human-delay 0, plain fields are written together in one bulk call)
+    bulk: Dict[str, str] = {}
     for entry in mapping.get("text", []):
         header = entry.get("csv", "")
-        sel = css_from_entry(entry)
+        sel = entry.get("_sel") or css_from_entry(entry)
 
         raw = row.get(header, "")
         val = norm_space(raw)
@@ -425,50 +636,69 @@ async def fill_current_page(page: Page, mapping: Dict[str, Any], row: Dict[str,
             if not val and entry.get("default_value"):
                 val = entry["default_value"]
             if not val and entry.get("halt_if_empty"):
-                print(f"[halt] required text '{header}' is empty; please fill CSV or remove halt_if_empty")
-                raise SystemExit(1)
+                raise RowHalted(f"required text '{header}' is empty; please fill CSV or remove halt_if_empty")
 
         if not val:
-            if debug: print(f"[skip] empty CSV for text {header}")
+            if debug: print(f"{tag}[skip] empty CSV for text {header}")
+            continue
+
+        if not present.get(("text", sel)):
+            if debug: print(f"{tag}[skip] control not on page: {sel} (csv: {header})")
             continue
 
-        if not await selector_visible(page, sel):
-            if debug: print(f"[skip] control not on page: {sel} (csv: {header})")
+        if human_delay <= 0 and not entry.get("react_controlled"):
+            bulk[sel] = val
             continue
 
-        if debug: print(f"[TYPE] {sel} ← {val!r}  (csv: {header})")
+        if debug: print(f"{tag}[TYPE] {sel} ← {val!r}  (csv: {header})")
         if await type_like_human(page, page.locator(sel), val, per_char_ms=human_delay, debug=debug):
             actions += 1
 
+    if bulk:
+        if debug: print(f"{tag}[FILL] bulk {len(bulk)} field(s): {list(bulk)}")
+        written = set(await fill_fields_bulk(page, bulk, debug))
+        actions += len(written)
+        for sel, val in bulk.items():
+            if sel in written:
+                continue
+            print(f"{tag}[warn] bulk fill missed {sel}; falling back to fill()")
+            if await type_like_human(page, page.locator(sel), val, per_char_ms=0, debug=debug):
+                actions += 1
+        # bounded check that the validation run by each field's focus/blur left no errors (returns as soon as it holds)
+        try:
+            await expect(page.locator(".error-message:visible")).to_have_count(0, timeout=2000)
+        except AssertionError:
+            print(f"{tag}[warn] validation errors after bulk fill: {await visible_error_messages(page)}")
+
     # RADIO
     for r in mapping.get("radio", []):
         group = r.get("group"); header = r.get("csv","")
         if not group or not header:
             continue
+        if not present.get(("radio", group)):
+            if debug: print(f"{tag}[skip] radio group not on page: {group}")
+            continue
         cell = norm_space(row.get(header, ""))
         if not cell and r.get("default_choice"):
             cell = r["default_choice"]
         if not cell:
-            if debug: print(f"[skip] empty CSV for radio {group}/{header}")
-            continue
-        if not await radio_group_present(page, group):
-            if debug: print(f"[skip] radio group not on page: {group}")
+            if debug: print(f"{tag}[skip] empty CSV for radio {group}/{header}")
             continue
 
         if r.get("default_if_nonempty"):
             sel = r["default_if_nonempty"]
-            if debug: print(f"[CLICK] {sel} (default_if_nonempty) (group={group}, csv={header})")
-            if await click_selector(page, sel, debug=debug): actions += 1
+            if debug: print(f"{tag}[CLICK] {sel} (default_if_nonempty) (group={group}, csv={header})")
+            if await check_radio(page, sel, debug=debug): actions += 1
             continue
 
-        mapped_sel = resolve_radio_selector(group, r.get("value_map", {}), cell)
+        mapped_sel = resolve_radio_selector(group, r.get("value_map", {}), cell, r.get("_value_map_ci"))
         if mapped_sel:
-            if debug: print(f"[CLICK] {mapped_sel} (group={group}, csv={header}, csv_value={cell!r})")
-            if await click_selector(page, mapped_sel, debug=debug): actions += 1
-            if r.get("other_text_css") and norm_case(cell).startswith("other"):
-                free = re.sub(r'^\s*other.*?:\s*', '', cell, flags=re.I).strip()
+            if debug: print(f"{tag}[CLICK] {mapped_sel} (group={group}, csv={header}, csv_value={cell!r})")
+            if await check_radio(page, mapped_sel, debug=debug): actions += 1
+            if r.get("other_text_css") and cell[:5].lower() == "other":  # cell is already normalized
+                free = OTHER_PREFIX_RE.sub('', cell).strip()
                 if free and await selector_visible(page, r["other_text_css"]):
-                    if debug: print(f"[TYPE] (other) {r['other_text_css']} ← {free!r}")
+                    if debug: print(f"{tag}[TYPE] (other) {r['other_text_css']} ← {free!r}")
                     if await type_like_human(page, page.locator(r["other_text_css"]), free, human_delay, debug): actions += 1
             continue
 
@@ -476,34 +706,37 @@ async def fill_current_page(page: Page, mapping: Dict[str, Any], row: Dict[str,
         if r.get("other_text_css"):
             other_radio = r.get("other_choice_selector") or derive_other_radio_selector(group, r["other_text_css"])
             if other_radio:
-                if debug: print(f"[CLICK] {other_radio} (auto-select Other; group={group}, csv={header})")
-                await click_selector(page, other_radio, debug=debug)
-                await page.wait_for_timeout(120)
+                if debug: print(f"{tag}[CLICK] {other_radio} (auto-select Other; group={group}, csv={header})")
+                await check_radio(page, other_radio, debug=debug)
 
             other_sel = r["other_text_css"]
-            refined = None
-            m = re.search(r"#mc-choice-input-(QID\\d+)-(\\d+)$", other_radio or "")
+            candidate = None
+            m = CHOICE_INPUT_RE.search(other_radio or "")
             if m:
                 g, idx = m.group(1), m.group(2)
                 candidate = f"label[for='mc-choice-input-{g}-{idx}'] input[type='text']"
-                if await page.locator(candidate).count() > 0:
-                    refined = candidate
-            target_sel = refined or other_sel
+            if other_radio:
+                # wait for the textbox itself; the mapped css can also match the choice input first
+                await wait_visible(page, candidate or f"{other_sel}[type='text']")
+            try:
+                target_sel, count, visible = await page.evaluate(OTHER_TEXT_TARGET_JS, [candidate, other_sel])
+            except Exception:
+                target_sel, count, visible = other_sel, 0, False
             loc = page.locator(target_sel)
-            if await loc.count() > 1:
+            if count > 1:
                 loc = page.locator(f"{target_sel}[type='text']")
-            if await selector_visible(page, target_sel):
-                if debug: print(f"[TYPE] (radio other auto) {target_sel} ← {cell!r}")
+            if visible:
+                if debug: print(f"{tag}[TYPE] (radio other auto) {target_sel} ← {cell!r}")
                 ok = await type_like_human(page, loc, cell, human_delay, debug)
                 if not ok:
                     try:
                         await loc.first.fill(cell); actions += 1
                     except Exception:
-                        if debug: print(f"[warn] failed to type into Other textbox for group={group}")
+                        if debug: print(f"{tag}[warn] failed to type into Other textbox for group={group}")
                 else:
                     actions += 1
             else:
-                if debug: print(f"[skip] Other textbox not visible for group={group}")
+                if debug: print(f"{tag}[skip] Other textbox not visible for group={group}")
 
     # CHECKBOX
     for c in mapping.get("checkbox", []):
@@ -511,24 +744,33 @@ async def fill_current_page(page: Page, mapping: Dict[str, Any], row: Dict[str,
         if not group or not header:
             continue
 
-        cell = row.get(header, "")
-        if not norm_space(cell):
-            if debug: print(f"[skip] empty CSV for checkbox {group}/{header}")
+        if not present.get(("checkbox", group)):
+            if debug: print(f"{tag}[skip] checkbox group not on page: {group}")
             continue
 
-        if not await checkbox_group_present(page, group):
-            if debug: print(f"[skip] checkbox group not on page: {group}")
+        cell = row.get(header, "")
+        if not norm_space(cell):
+            if debug: print(f"{tag}[skip] empty CSV for checkbox {group}/{header}")
             continue
 
-        to_check, unmatched = resolve_checkboxes(group, c.get("value_map"), cell, c.get("multi_delimiter"))
+        to_check, unmatched = resolve_checkboxes(group, c.get("value_map"), cell, c.get("multi_delimiter"),
+                                                c.get("_value_map_ci"))
 
-        # mapped → .check() is safer than click (avoids toggling off)
-        for sel in to_check:
+        # mapped → set every box in one evaluate (only unchecked ones are clicked, so nothing
+        # toggles off); boxes that didn't stick fall back to .check(), then a plain click
+        try:
+            states = await page.evaluate(CHECK_BOXES_JS, to_check) if to_check else []
+        except Exception:
+            states = [False] * len(to_check)
+        for sel, ok in zip(to_check, states):
+            if ok:
+                if debug: print(f"{tag}[CHECK] {sel} (group={group}, csv={header})")
+                actions += 1
+                continue
             loc = page.locator(sel).first
             try:
-                await loc.scroll_into_view_if_needed()
-                await loc.check(force=True)
-                if debug: print(f"[CHECK] {sel} (group={group}, csv={header})")
+                await loc.check(force=True, timeout=3000)
+                if debug: print(f"{tag}[CHECK] {sel} (group={group}, csv={header})")
                 actions += 1
             except Exception:
                 if await click_selector(page, sel, debug=debug):
@@ -537,8 +779,8 @@ async def fill_current_page(page: Page, mapping: Dict[str, Any], row: Dict[str,
         # explicit "Other: ..." tokens also feed the Other text
         explicit_others = []
         for tok in parse_multi(cell, c.get("multi_delimiter")):
-            if norm_case(tok).startswith("other"):
-                v = re.sub(r'^\s*other.*?:\s*', '', tok, flags=re.I).strip()
+            if tok[:5].lower() == "other":  # parse_multi already normalized tok
+                v = OTHER_PREFIX_RE.sub('', tok).strip()
                 if v:
                     explicit_others.append(v)
 
@@ -548,18 +790,23 @@ async def fill_current_page(page: Page, mapping: Dict[str, Any], row: Dict[str,
             if other_radio:
                 other_loc = page.locator(other_radio).first
                 try:
-                    await other_loc.scroll_into_view_if_needed()
-                    await other_loc.check(force=True)
+                    await other_loc.check(force=True, timeout=3000)
                 except Exception:
                     await click_selector(page, other_radio, debug=debug)
-                await page.wait_for_timeout(150)
 
-            refined = None
+            candidate = None
             m = OTHER_RE.search(c["other_text_css"])
             if m:
                 g, idx = m.group(1), m.group(2)
-                refined = f"label[for='mc-choice-input-{g}-{idx}'] input[type='text']"
-            target_sel = refined or c["other_text_css"]
+                candidate = f"label[for='mc-choice-input-{g}-{idx}'] input[type='text']"
+            if other_radio:
+                # wait for the textbox itself; the mapped css can also match the choice input first
+                await wait_visible(page, candidate or f"{c['other_text_css']}[type='text']")
+            # label-scoped candidate if it exists, else the mapped css — resolved with visibility in one evaluate
+            try:
+                target_sel, _, visible = await page.evaluate(OTHER_TEXT_TARGET_JS, [candidate, c["other_text_css"]])
+            except Exception:
+                target_sel, visible = c["other_text_css"], False
 
             combined = []
             seen = set()
@@ -570,35 +817,38 @@ async def fill_current_page(page: Page, mapping: Dict[str, Any], row: Dict[str,
                     seen.add(k)
             txt = ", ".join(combined)
 
-            if await selector_visible(page, target_sel):
-                if debug: print(f"[TYPE] (checkbox other) {target_sel} ← {txt!r}")
-                ok = await type_like_human(page, page.locator(target_sel), txt, human_delay, debug)
+            target_loc = page.locator(target_sel)
+            if visible:
+                if debug: print(f"{tag}[TYPE] (checkbox other) {target_sel} ← {txt!r}")
+                ok = await type_like_human(page, target_loc, txt, human_delay, debug)
                 if not ok:
                     try:
-                        await page.locator(target_sel).first.fill(txt)
+                        await target_loc.first.fill(txt)
                         actions += 1
                     except Exception:
-                        if debug: print(f"[warn] failed to type into checkbox Other textbox for group={group}")
+                        if debug: print(f"{tag}[warn] failed to type into checkbox Other textbox for group={group}")
                 else:
                     actions += 1
             else:
-                if debug: print(f"[skip] Other textbox not visible for group={group}")
+                if debug: print(f"{tag}[skip] Other textbox not visible for group={group}")
 
         if unmatched:
-            print(f"[skip] (checkbox entries not mapped) group={group}; csv={header}; unmatched={unmatched}")
+            print(f"{tag}[skip] (checkbox entries not mapped) group={group}; csv={header}; unmatched={unmatched}")
 
     # COMBOBOX
     for cb in mapping.get("combobox", []):
-        header = cb.get("csv",""); cid = cb.get("id"); want = row.get(header, "")
-        if not cid or not header or not norm_space(want):
-            if debug and header and not norm_space(want):
-                print(f"[skip] empty CSV for combobox {cid}/{header}")
+        header = cb.get("csv",""); cid = cb.get("id")
+        if not cid or not header:
             continue
-        if not await combobox_present(page, cid):
-            if debug: print(f"[skip] combobox not on page: {cid}")
+        if not present.get(("combobox", cid)):
+            if debug: print(f"{tag}[skip] combobox not on page: {cid}")
+            continue
+        want = row.get(header, "")
+        if not norm_space(want):
+            if debug: print(f"{tag}[skip] empty CSV for combobox {cid}/{header}")
             continue
         if cb.get("choose_by_text", True):
-            if debug: print(f"[COMBO] #{cid} ← {want!r} (by text)")
+            if debug: print(f"{tag}[COMBO] #{cid} ← {want!r} (by text)")
             if await choose_combobox_by_text(page, cid, want, debug): actions += 1
 
     return actions
@@ -607,157 +857,306 @@ async def fill_current_page(page: Page, mapping: Dict[str, Any], row: Dict[str,
 # Navigation
 # -----------------------
 
-async def click_next_and_wait(page: Page, debug: bool) -> None:
+async def next_button_ready(page: Page) -> bool:
+    """#next-button exists, is visible and enabled — one evaluate instead of count + is_enabled."""
+    try:
+        return bool(await page.evaluate("""() => {
+            const b = document.querySelector('#next-button');
+            return !!b && !b.disabled && b.getClientRects().length > 0;
+        }"""))
+    except Exception:
+        return False
+
+async def click_next_and_wait(page: Page, debug: bool, tag: str = "") -> Optional[List[str]]:
+    """
+    Clicks Next and waits for the next page; returns its question ids (None if unknown).
+    'tag' prefixes log lines (e.g. "[row 3] ") so concurrent rows stay readable.
+    """
     try:
         prev_qids = await page.eval_on_selector_all(
             "section.question[id^='question-QID']",
             "els => els.map(e=>e.id)"
         )
-        await click_selector(page, "#next-button", debug=debug)
-
-        # Detect DOM changes rather than networkidle (Qualtrics is client-driven)
-        for _ in range(60):  # ~6-7s total
-            await page.wait_for_timeout(120)
-            curr_qids = await page.eval_on_selector_all(
-                "section.question[id^='question-QID']",
-                "els => els.map(e=>e.id)"
-            )
-            if set(curr_qids) != set(prev_qids):
-                break
-
-        await page.wait_for_timeout(120)
-
+        await click_selector(page, "#next-button", debug=debug, pace=False)
+        await page.wait_for_load_state("domcontentloaded")
+
+        # Detect DOM changes rather than networkidle (Qualtrics is client-driven);
+        # the id comparison runs in the page and the first check is immediate.
+        # An empty question set only counts once Next is gone too (end page), so the
+        # blank frame between two pages isn't mistaken for the end of the survey.
+        changed = await wait_for_condition(
+            page,
+            """(arg) => {
+                const ids = Array.from(document.querySelectorAll(arg.sel)).map(e => e.id);
+                const differs = ids.length !== arg.prev.length || ids.some(id => !arg.prev.includes(id));
+                return differs && (ids.length > 0 || !document.querySelector('#next-button')) && {ids};
+            }""",
+            {"sel": "section.question[id^='question-QID']", "prev": prev_qids},
+            timeout_ms=7000,
+            interval_ms=120
+        )
+        if not changed:
+            errors = await visible_error_messages(page)
+            if errors:
+                print(f"{tag}[warn] validation errors after Next: {errors}")
+            elif debug:
+                print(f"{tag}[debug] question set unchanged after Next")
+            return None
+
+        # page scans are done once at the top of the next fill step, not here as well
         if debug:
-            await list_visible_questions(page)
-            await debug_scan_page(page)
-            print("[debug] advanced to next page")
+            print(f"{tag}[debug] advanced to next page")
+        return changed["ids"]
     except Exception as e:
-        print(f"[warn] next-page wait issue: {e}")
+        print(f"{tag}[warn] next-page wait issue: {e}")
+        return None
 
 # -----------------------
 # Plan preview (optional)
 # -----------------------
 
 def print_action_plan(mapping: Dict[str, Any], row: Dict[str, str]) -> None:
-    print("=== ACTION PLAN (preview) ===")
-    i = 1
+    out = ["=== ACTION PLAN (preview) ==="]
     if mapping.get("start_url"):
-        print(f"{i:02d}. NAVIGATE → {mapping['start_url']}"); i += 1
+        out.append(f"NAVIGATE → {mapping['start_url']}")
     for entry in mapping.get("text", []):
-        header = entry.get("csv",""); val = row.get(header,""); sel = css_from_entry(entry)
-        print(f"{i:02d}. {'TYPE' if norm_space(val) else 'SKIP '}  {sel}  ←  {val!r}   (csv: {header})"); i += 1
+        header = entry.get("csv",""); val = row.get(header,""); sel = entry.get("_sel") or css_from_entry(entry)
+        out.append(f"{'TYPE' if norm_space(val) else 'SKIP '}  {sel}  ←  {val!r}   (csv: {header})")
     for r in mapping.get("radio", []):
         group = r.get("group"); header = r.get("csv",""); cell = row.get(header,"")
         if r.get("default_if_nonempty") and norm_space(cell):
-            print(f"{i:02d}. CLICK   {r['default_if_nonempty']}  (group={group}, csv={header})"); i+=1
+            out.append(f"CLICK   {r['default_if_nonempty']}  (group={group}, csv={header})")
         else:
-            print(f"{i:02d}. RADIO   group={group}  csv={header}  value={cell!r}"); i+=1
+            out.append(f"RADIO   group={group}  csv={header}  value={cell!r}")
     for c in mapping.get("checkbox", []):
-        header = c.get("csv",""); print(f"{i:02d}. CHECKBOX group={c.get('group')} csv={header}"); i+=1
+        header = c.get("csv",""); out.append(f"CHECKBOX group={c.get('group')} csv={header}")
     for cb in mapping.get("combobox", []):
         header = cb.get("csv",""); cid = cb.get("id"); want = row.get(header,"")
-        print(f"{i:02d}. COMBO   #{cid} ← {want!r} (csv: {header})"); i+=1
+        out.append(f"COMBO   #{cid} ← {want!r} (csv: {header})")
+    # numbered and written in one go rather than a print() per action
+    lines = [out[0]] + [f"{i:02d}. {line}" for i, line in enumerate(out[1:], 1)]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 # -----------------------
 # Batch processing
 # -----------------------
 
-async def process_single_row(pw, mapping: Dict[str, Any], row: Dict[str, str], idx: int, opts) -> None:
+async def prompt_enter(message: str) -> None:
+    """
+    Waits for Enter without blocking the event loop (Playwright and the route handlers
+    keep running). stdin is read on a daemon thread rather than the default executor,
+    so Ctrl-C shutdown doesn't wait for a thread stuck on the prompt. It reads the raw
+    fd (not input()) so that thread never holds sys.stdin's buffer lock at exit.
+    """
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+
+    def settle(err: Optional[BaseException]) -> None:
+        if done.done():
+            return
+        if err is None:
+            done.set_result(None)
+        else:
+            done.set_exception(err)
+
+    def read() -> None:
+        err = None
+        try:
+            sys.stdout.write(message); sys.stdout.flush()
+            # one byte at a time so each prompt consumes exactly one line (like input())
+            while True:
+                ch = os.read(sys.stdin.fileno(), 1)
+                if not ch:
+                    raise EOFError("stdin closed while waiting for Enter")
+                if ch == b"\n":
+                    break
+        except BaseException as e:
+            err = e
+        try:
+            loop.call_soon_threadsafe(settle, err)
+        except RuntimeError:
+            pass  # loop already closed (run was cancelled)
+
+    threading.Thread(target=read, daemon=True).start()
+    await done
+
+# Images/fonts/media are never needed to fill the form; CSS stays (visibility checks depend on it)
+BLOCKED_ASSET_RE = re.compile(r"\.(png|jpe?g|gif|webp|ico|woff2?|ttf|otf|mp4|webm)(\?|$)", re.I)
+# Third-party trackers only (never Qualtrics' own hosts)
+BLOCKED_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "segment.io", "segment.com",
+    "hotjar.com", "connect.facebook.net", "fullstory.com", "newrelic.com", "nr-data.net",
+    "browser-intake-datadoghq.com", "datadoghq-browser-agent.com",
+)
+BLOCKED_HOST_RE = re.compile(r"//([^/]*\.)?(" + "|".join(map(re.escape, BLOCKED_HOSTS)) + r")(:\d+)?(/|$)", re.I)
+
+async def process_single_row(browser, mapping: Dict[str, Any], row: Dict[str, str], idx: int, opts) -> None:
     print(f"\n[batch] Row {idx+1}: starting…")
-    print_action_plan(mapping, row)
+    if opts.debug:
+        print_action_plan(mapping, row)
 
-    # Fresh browser per row
-    browser = await pw.chromium.launch(
-        headless=not opts.headful,
-        args=["--disable-blink-features=AutomationControlled"]
-    )
+    # Fresh (isolated) context per row on the shared browser
     ctx = await browser.new_context(viewport={"width": 1360, "height": 900})
+    await ctx.route(BLOCKED_ASSET_RE, lambda route: route.abort())
+    await ctx.route(BLOCKED_HOST_RE, lambda route: route.abort())
+    try:
+        await fill_row(ctx, mapping, row, idx, opts)
+    finally:
+        await ctx.close()
+    print(f"[batch] Row {idx+1}: done.")
+
+async def fill_row(ctx, mapping: Dict[str, Any], row: Dict[str, str], idx: int, opts) -> None:
+    tag = f"[row {idx+1}] "
     page = await ctx.new_page()
+    # fail fast on a missing/stuck control (every caller has a fallback); loads keep the long timeout
+    page.set_default_timeout(5000)
+    page.set_default_navigation_timeout(30000)
 
     # Start URL
     if mapping.get("start_url"):
-        print(f"[nav] {mapping['start_url']}")
+        print(f"{tag}[nav] {mapping['start_url']}")
         await page.goto(mapping["start_url"], wait_until="domcontentloaded")
+        # Qualtrics renders client-side: wait for the first control instead of a network-idle heuristic
+        ready_sel = mapping.get("ready_selector") or "#next-button"
+        try:
+            await page.locator(ready_sel).first.wait_for(state="visible", timeout=15000)
+        except PWTimeout:
+            print(f"{tag}[warn] ready selector not visible after load: {ready_sel}")
 
     step = 0
     while True:
         step += 1
-        print(f"\n[page] Filling visible page (step {step}) …")
+        qids: Optional[List[str]] = None
+        print(f"\n{tag}[page] Filling visible page (step {step}) …")
         if opts.debug:
-            
-            await list_visible_questions(page)
             await debug_scan_page(page)
 
-        did = await fill_current_page(page, mapping, row, human_delay=opts.human_delay, debug=opts.debug)
+        did = await fill_current_page(page, mapping, row, human_delay=opts.human_delay, debug=opts.debug, tag=tag)
 
-        next_btn = page.locator("#next-button")
         if did == 0:
-            if opts.debug: print("[info] No mapped controls on this page. Auto-click Next.")
-            if await next_btn.count() and await next_btn.first.is_enabled():
-                await click_next_and_wait(page, debug=opts.debug)
+            if opts.debug: print(f"{tag}[info] No mapped controls on this page. Auto-click Next.")
+            if await next_button_ready(page):
+                qids = await click_next_and_wait(page, debug=opts.debug, tag=tag)
             else:
-                print("[halt] Next not available/enabled on an unmapped page — moving to next CSV row.")
+                print(f"{tag}[halt] Next not available/enabled on an unmapped page — moving to next CSV row.")
                 break
         else:
             if opts.manual_continue:
-                input("Press Enter after you review this page and click Next yourself…")
+                try:
+                    await prompt_enter(f"{tag}Press Enter after you review this page and click Next yourself…")
+                except asyncio.CancelledError:
+                    print(f"\n{tag}[cancelled] manual-continue prompt abandoned")
+                    raise
             else:
-                if await next_btn.count() and await next_btn.first.is_enabled():
-                    await click_next_and_wait(page, debug=opts.debug)
+                if await next_button_ready(page):
+                    qids = await click_next_and_wait(page, debug=opts.debug, tag=tag)
                 else:
-                    print("[warn] Next disabled; pausing for manual fix.")
+                    print(f"{tag}[warn] Next disabled; pausing for manual fix.")
                     break
 
-        # End condition: no more questions (finished or thank-you page)
-        if (await page.locator("section.question[id^='question-QID']").count()) == 0:
-            print("[done] No questions detected on page; reached end.")
+        # End condition: no more questions (finished or thank-you page); reuse the ids
+        # the post-Next wait already saw instead of querying again
+        if qids is None:
+            qids = await page.eval_on_selector_all("section.question[id^='question-QID']", "els => els.map(e=>e.id)")
+        if not qids:
+            print(f"{tag}[done] No questions detected on page; reached end.")
             break
 
-    await ctx.close()
-    await browser.close()
-    print(f"[batch] Row {idx+1}: done.")
-
 # -----------------------
 # Main
 # -----------------------
 
-async def run(opts):
+async def run(opts) -> int:
     # Load mapping & allow CLI override of start URL
-    mapping = json.loads(Path(opts.mapping).read_text(encoding="utf-8"))
+    mapping = prepare_mapping(json.loads(Path(opts.mapping).read_text(encoding="utf-8")))
     if opts.start_url:
         mapping["start_url"] = opts.start_url
 
-    # CSV rows (DictReader handles the header row)
+    # CSV rows (DictReader handles the header row). A single --row-index only
+    # reads up to that row instead of loading the whole file.
+    raw_rows: Dict[int, Dict[str, str]] = {}
+    single = opts.row_index is not None and not opts.all
     with open(opts.csv, newline="", encoding="utf-8-sig") as f:
         rdr = csv.DictReader(f)
-        rows = list(rdr)
-
-    if not rows:
-        print("[error] CSV has no data rows")
-        return
+        if single and opts.row_index >= 0:
+            hit = next(islice(rdr, opts.row_index, None), None)
+            if hit is not None:
+                raw_rows[opts.row_index] = hit
+        elif not single:
+            raw_rows = dict(enumerate(rdr))
 
     # Determine which rows to run (0-based over data rows)
     indices: List[int]
-    if opts.all:
-        indices = list(range(len(rows)))
-    elif opts.row_index is not None:
-        if opts.row_index < 0 or opts.row_index >= len(rows):
-            print(f"[error] --row-index out of range (0..{len(rows)-1})"); return
+    if single:
+        if opts.row_index not in raw_rows:
+            with open(opts.csv, newline="", encoding="utf-8-sig") as f:
+                total = sum(1 for _ in csv.DictReader(f))
+            if not total:
+                print("[error] CSV has no data rows"); return 1
+            print(f"[error] --row-index out of range (0..{total-1})"); return 1
         indices = [opts.row_index]
+    elif not raw_rows:
+        print("[error] CSV has no data rows")
+        return 1
+    elif opts.all:
+        indices = list(range(len(raw_rows)))
     else:
+        rows_count = len(raw_rows)
         start = 0 if opts.start_index is None else opts.start_index
-        end = (len(rows) - 1) if (opts.end_index is None or opts.end_index < 0) else opts.end_index
+        end = (rows_count - 1) if (opts.end_index is None or opts.end_index < 0) else opts.end_index
         if start < 0: start = 0
-        if end >= len(rows): end = len(rows) - 1
+        if end >= rows_count: end = rows_count - 1
         if start > end:
-            print(f"[error] start_index ({start}) > end_index ({end})"); return
+            print(f"[error] start_index ({start}) > end_index ({end})"); return 1
         indices = list(range(start, end + 1))
 
     print(f"[batch] Will process {len(indices)} data row(s): {indices}")
+    rows = {i: normalize_row(raw_rows[i], mapping.get("_used_cols")) for i in indices}
+    del raw_rows  # only the selected, normalized rows stay alive for the batch
+
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for i in indices:
+        queue.put_nowait(i)
 
     async with async_playwright() as pw:
-        for i in indices:
-            await process_single_row(pw, mapping, rows[i], i, opts)
+        browser = await pw.chromium.launch(
+            headless=not opts.headful,
+            args=["--disable-blink-features=AutomationControlled"]
+        )
+
+        halted: Dict[int, str] = {}
+        failed: Dict[int, str] = {}
+
+        async def worker() -> None:
+            while not queue.empty():
+                i = queue.get_nowait()
+                try:
+                    await process_single_row(browser, mapping, rows[i], i, opts)
+                except RowHalted as e:
+                    halted[i] = str(e)
+                    print(f"[halt] Row {i+1}: {e}")
+                except Exception as e:
+                    failed[i] = f"{type(e).__name__}: {e}"
+                    print(f"[error] Row {i+1} failed: {e}")
+                    if opts.debug:
+                        traceback.print_exc()
+
+        workers = max(1, min(opts.concurrency, len(indices)))
+        try:
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            await browser.close()
+
+    # Rows listed here were NOT submitted; don't mark them as filled
+    if halted or failed:
+        print(f"\n[batch] {len(indices) - len(halted) - len(failed)} of {len(indices)} row(s) completed; NOT submitted:")
+        for i in sorted(halted):
+            print(f"  - Row {i+1} halted: {halted[i]}")
+        for i in sorted(failed):
+            print(f"  - Row {i+1} failed: {failed[i]}")
+        return 1
+    print(f"\n[batch] All {len(indices)} row(s) completed.")
+    return 0
 
 def parse_args(argv=None):
     p = argparse.ArgumentParser(description="Qualtrics form auto-fill (batch-capable)")
@@ -770,14 +1169,19 @@ def parse_args(argv=None):
     p.add_argument("--end-index", type=int, default=None, help="Last CSV data row to process (0-based). Use -1 for 'last'.")
     p.add_argument("--all", action="store_true", help="Process all CSV data rows.")
     # Behavior
-    p.add_argument("--human-delay", type=int, default=28, help="Typing delay per character (ms).")
+    p.add_argument("--human-delay", type=int, default=28, help="Typing delay per character (ms). 0 writes text fields in one bulk DOM call.")
+    p.add_argument("--concurrency", type=int, default=1, help="Rows filled in parallel (one browser context each).")
     p.add_argument("--headful", action="store_true", help="Visible browser window.")
     p.add_argument("--manual-continue", action="store_true", help="Pause on each page for manual Next.")
     p.add_argument("--debug", action="store_true", help="Verbose logs & scans.")
-    return p.parse_args(argv)
+    args = p.parse_args(argv)
+    if args.manual_continue and args.concurrency > 1:
+        p.error("--manual-continue needs --concurrency 1")
+    return args
 
 if __name__ == "__main__":
     try:
-        asyncio.run(run(parse_args()))
+        sys.exit(asyncio.run(run(parse_args())))
     except KeyboardInterrupt:
         print("\n[cancelled]")
+        sys.exit(130)